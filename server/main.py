@@ -1,12 +1,48 @@
-import json
+import atexit
+import base64
+import functools
+import hashlib
+import hmac
+import importlib.util
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from threading import Lock
+from types import MappingProxyType, SimpleNamespace
 from typing import Optional, List
-from flask import Flask, request, jsonify, Response
-from flask_cors import CORS
-from supabase import create_client, Client
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
+from flask import Flask, request, Response
+from flask.json.provider import JSONProvider
+from supabase import create_client, Client, ClientOptions
+
+try:
+    # Optional: direct Postgres access for the hot SQL functions (skips PostgREST and its JSON round trip)
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (used by request.get_json and jsonify)"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+def ojsonify(obj, status=200):
+    """Serialize obj with orjson into a JSON response (skips the str round trip of jsonify)"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
 
 # CORS configuration - allow ALL origins with credentials
 # Using a custom response handler instead of origins parameter
@@ -21,82 +57,305 @@ def after_request(response):
     return response
 
 # Configuration
+CONFIG_DIR = Path(__file__).parent.parent / 'src' / 'public'
 CONFIG = {}
+# Read-only view of the values used on the request path, built once by load_config()
+CFG = SimpleNamespace(project_url=None, anon_key=None)
 GET_TOKEN = None
 POST_TOKEN = None
-# supase = None # not thread-safe. even if supabase don't maintain active network connection with server.
+# Encoded tokens for constant-time comparison
+GET_TOKEN_B = b''
+POST_TOKEN_B = b''
+# Shared Supabase client, created once in load_config() and reused by all request threads
+supabase: Optional[Client] = None
+DB_POOL = None  # psycopg ConnectionPool, only when DATABASE_URL is configured
+HTTPX_MAX_CONNECTIONS = 32
+HTTPX_MAX_KEEPALIVE_CONNECTIONS = 32
+HTTPX_KEEPALIVE_EXPIRY = 60
+# HTTP/2 multiplexes concurrent requests over one connection (needs the optional h2 package)
+HTTPX_HTTP2 = importlib.util.find_spec('h2') is not None
+DB_POOL_MIN_SIZE = 4
+DB_POOL_MAX_SIZE = 32
+# Seconds to wait for a pooled Postgres connection before using PostgREST for that call
+DB_POOL_TIMEOUT = 2
+# After this many consecutive pool failures, skip the pool for DB_POOL_COOLDOWN seconds
+DB_POOL_MAX_FAILURES = 3
+DB_POOL_COOLDOWN = 60
+_db_pool_failures = 0
+_db_pool_skip_until = 0.0
+# Default number of levels returned by fetch_type=tree (override with ?depth=N, clamped to 1..TREE_MAX_DEPTH_LIMIT)
+TREE_MAX_DEPTH = 8
+TREE_MAX_DEPTH_LIMIT = 32
+# Staleness bound: writes usually go straight to Supabase (the memo UI), bypassing this server, so nothing
+# invalidates the caches below except /admin/flush-cache. Every server-side cache expires within SERVER_CACHE_TTL
+# and clients reuse content for at most CONTENT_MAX_AGE, so an edit reaches every client within STALE_READ_WINDOW
+# seconds (listings revalidate on every request, so they lag by SERVER_CACHE_TTL at most)
+STALE_READ_WINDOW = 30
+SERVER_CACHE_TTL = STALE_READ_WINDOW // 2
+# Seconds clients may reuse a content response before revalidating with its ETag
+CONTENT_MAX_AGE = STALE_READ_WINDOW - SERVER_CACHE_TTL
+# Binary payloads larger than this (decoded size) are decoded and sent in chunks
+BINARY_STREAM_MIN_SIZE = 1024 * 1024
+BINARY_STREAM_CHUNK_SIZE = 64 * 1024
+
+# type_code → MIME type (mirrors the content_type table), read-only
+_CONTENT_TYPES = MappingProxyType({
+    1: 'text/plain',
+    2: 'text/html',
+    3: 'text/markdown',
+    10: 'image/png',  # Legacy base64 images
+    21: 'application/pdf',  # Legacy base64 PDFs
+})
+# type_codes served with their own MIME type when stored in content_binary
+_BINARY_TYPES = frozenset({10, 21})
+
+# Resolved path (tuple of segment names) → segment/content ID
+# Misses are cached separately and only briefly, so newly created paths don't stay 404
+# (sized larger since scanner traffic produces many distinct misses; TTL overridable via NEGATIVE_CACHE_TTL,
+# capped at SERVER_CACHE_TTL)
+_PATH_CACHE = TTLCache(maxsize=4096, ttl=SERVER_CACHE_TTL)
+_PATH_NEG_CACHE = TTLCache(maxsize=16384, ttl=min(float(os.getenv('NEGATIVE_CACHE_TTL', '5')), SERVER_CACHE_TTL))
+_PATH_LOCK = Lock()
+
+# Worker threads for independent Supabase calls within one request (blocking HTTP, releases the GIL)
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='supabase')
+
+# Root listing (landing page), cached briefly
+_ROOT_CACHE = TTLCache(maxsize=1, ttl=10)
+_ROOT_LOCK = Lock()
+
+# Children/content results of the PostgreSQL functions, keyed by (kind, path)
+# Bounded by approximate size in bytes; large values (e.g. big images) are never cached
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_MAX_VALUE_BYTES = 256 * 1024
+
+def _result_size(result: dict) -> int:
+    """Approximate memory footprint of a cached result in bytes"""
+    data = result.get('data', {})
+    value = data.get('value')
+    if value is not None:
+        return len(value) + 256
+    return 256 * (len(data.get('items', [])) + 1)
+
+_RESULT_CACHE = TTLCache(maxsize=RESULT_CACHE_MAX_BYTES, ttl=SERVER_CACHE_TTL, getsizeof=_result_size)
+_RESULT_LOCK = Lock()
+
+# Decoded binary payloads, keyed by (binary_id, content ETag) so edited content never serves stale bytes
+# Only small payloads land here; large ones are streamed and decoded chunk by chunk
+_BINARY_CACHE = LRUCache(maxsize=32 * 1024 * 1024, getsizeof=len)
+_BINARY_LOCK = Lock()
+
+def cache_result(kind: str):
+    """Cache successful results of fn(supabase, segments) across requests"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(supabase: Client, segments: List[str]):
+            key = (kind, tuple(segments))
+            with _RESULT_LOCK:
+                result = _RESULT_CACHE.get(key)
+            if result is not None:
+                return result
+            
+            result = fn(supabase, segments)
+            if result['code'] == 0 and _result_size(result) <= RESULT_CACHE_MAX_VALUE_BYTES:
+                with _RESULT_LOCK:
+                    _RESULT_CACHE[key] = result
+            return result
+        return wrapper
+    return decorator
 
 def load_config():
     """Load configuration from config.json and config.0.json files"""
-    global CONFIG, GET_TOKEN, POST_TOKEN
+    global CFG, GET_TOKEN, POST_TOKEN, GET_TOKEN_B, POST_TOKEN_B, supabase, DB_POOL
     
-    config_path = Path(__file__).parent.parent / 'src' / 'public' / 'config.json'
-    config_0_path = Path(__file__).parent.parent / 'src' / 'public' / 'config.0.json'
+    config_path = CONFIG_DIR / 'config.json'
+    config_0_path = CONFIG_DIR / 'config.0.json'
     
     # Load config.json
     if config_path.exists():
         try:
-            with open(config_path, 'r') as f:
-                CONFIG.update(json.load(f))
+            with open(config_path, 'rb') as f:
+                CONFIG.update(orjson.loads(f.read()))
         except Exception as e:
-            print(f"Warning: Failed to load config.json: {e}")
+            logger.warning("Failed to load config.json: %s", e)
     
     # Load config.0.json (overwrites config.json)
     if config_0_path.exists():
         try:
-            with open(config_0_path, 'r') as f:
-                CONFIG.update(json.load(f))
+            with open(config_0_path, 'rb') as f:
+                CONFIG.update(orjson.loads(f.read()))
         except Exception as e:
-            print(f"Warning: Failed to load config.0.json: {e}")
+            logger.warning("Failed to load config.0.json: %s", e)
+    
+    CFG = SimpleNamespace(project_url=CONFIG.get('project_url'), anon_key=CONFIG.get('anon_key'))
     
     # Set tokens
     GET_TOKEN = os.getenv('GET_TOKEN', 'example_token')
     POST_TOKEN = os.getenv('POST_TOKEN', 'example_post_token')
+    GET_TOKEN_B = GET_TOKEN.encode()
+    POST_TOKEN_B = POST_TOKEN.encode()
     
     # Verify Supabase configuration
-    if CONFIG.get('project_url') and CONFIG.get('anon_key'):
-        print(f"✓ Supabase configuration loaded: {CONFIG['project_url']}")
+    if CFG.project_url and CFG.anon_key:
+        logger.info("✓ Supabase configuration loaded: %s", CFG.project_url)
     else:
-        print(f"✗ Supabase configuration incomplete")
-
-def get_supabase_client() -> Optional[Client]:
-    """Create a new Supabase client for this request"""
-    if not CONFIG.get('project_url') or not CONFIG.get('anon_key'):
-        return None
+        logger.warning("✗ Supabase configuration incomplete")
+        return
+    
+    # Create the shared client once, backed by a pooled httpx client (keep-alive, no per-request TLS handshake)
+    httpx_limits = httpx.Limits(
+        max_connections=HTTPX_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTPX_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTPX_KEEPALIVE_EXPIRY
+    )
+    httpx_client = httpx.Client(http2=HTTPX_HTTP2, limits=httpx_limits, timeout=httpx.Timeout(30, connect=2))
+    atexit.register(httpx_client.close)
     
     try:
-        return create_client(CONFIG['project_url'], CONFIG['anon_key'])
+        supabase = create_client(CFG.project_url, CFG.anon_key, options=ClientOptions(httpx_client=httpx_client))
+        logger.info("✓ Supabase client created (http2=%s, max_connections=%s, max_keepalive_connections=%s, keepalive_expiry=%ss)",
+                    HTTPX_HTTP2, HTTPX_MAX_CONNECTIONS, HTTPX_MAX_KEEPALIVE_CONNECTIONS, HTTPX_KEEPALIVE_EXPIRY)
     except Exception as e:
-        print(f"✗ Failed to create Supabase client: {e}")
-        return None
+        logger.error("✗ Failed to create Supabase client: %s", e)
+        supabase = None
+    
+    # Direct Postgres pool (optional) - SQL functions are then called over the binary protocol
+    database_url = os.getenv('DATABASE_URL') or CONFIG.get('database_url')
+    if database_url and ConnectionPool is None:
+        logger.warning("✗ DATABASE_URL set but psycopg_pool is not installed, using PostgREST")
+    elif database_url:
+        try:
+            pool = ConnectionPool(database_url, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, timeout=DB_POOL_TIMEOUT,
+                                  kwargs={'row_factory': dict_row, 'autocommit': True}, open=True)
+        except Exception as e:
+            logger.error("✗ Failed to create Postgres pool: %s", e)
+            return
+        try:
+            # Fail fast on a wrong DATABASE_URL or unreachable database instead of stalling requests later
+            pool.wait(timeout=DB_POOL_TIMEOUT)
+        except Exception as e:
+            logger.error("✗ Postgres pool could not connect, using PostgREST: %s", e)
+            pool.close()
+            return
+        DB_POOL = pool
+        atexit.register(DB_POOL.close)
+        logger.info("✓ Postgres pool created (min_size=%s, max_size=%s)", DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
 
-def verify_token(token_type='GET'):
-    """Verify token from request parameters"""
-    token = request.args.get('token', '')
-    expected = GET_TOKEN if token_type == 'GET' else POST_TOKEN
+def call_path_function(supabase: Client, name: str, segments: List[str]) -> List[dict]:
+    """Call a path_segments SQL function, directly via the Postgres pool when configured, else via PostgREST rpc
+    Pool errors fall back to PostgREST; repeated errors skip the pool for a while"""
+    global _db_pool_failures, _db_pool_skip_until
     
-    if expected and token != expected:
-        return False
-    return True
+    if DB_POOL is not None and time.monotonic() >= _db_pool_skip_until:
+        try:
+            # name is always one of our own function names, never user input
+            with DB_POOL.connection() as conn:
+                rows = conn.execute(f'SELECT * FROM {name}(%s::text[])', (segments,)).fetchall()
+            _db_pool_failures = 0
+            return rows
+        except Exception as e:
+            _db_pool_failures += 1
+            logger.warning("[FALLBACK] Postgres pool call %s failed (%s in a row): %s, using PostgREST", name, _db_pool_failures, e)
+            if _db_pool_failures >= DB_POOL_MAX_FAILURES:
+                _db_pool_skip_until = time.monotonic() + DB_POOL_COOLDOWN
+                _db_pool_failures = 0
+    
+    return supabase.rpc(name, {'path_segments': segments}).execute().data
+
+def get_supabase_client() -> Optional[Client]:
+    """Return the shared Supabase client (None if not configured)"""
+    return supabase
 
+def verify_token(token: str, token_type='GET'):
+    """Verify a token taken from the request parameters"""
+    token = token.encode()
+    expected = GET_TOKEN_B if token_type == 'GET' else POST_TOKEN_B
+    
+    return not expected or hmac.compare_digest(token, expected)
+
+@functools.lru_cache(maxsize=8192)
 def parse_path(path_str: str):
-    """Parse a path string into segment IDs, handling trailing slash"""
-    # Remove leading slash
-    if path_str.startswith('/'):
-        path_str = path_str[1:]
+    """Parse a path string into segment IDs, handling trailing slash
+    Returns a tuple of segments (immutable, the result is cached per path string)"""
+    # Bare root: the leading slash is not a trailing slash
+    if path_str == '/':
+        return (), False
     
-    # Check for trailing slash
     has_trailing_slash = path_str.endswith('/')
-    
-    # Remove trailing slash for parsing
-    if has_trailing_slash:
-        path_str = path_str[:-1]
-    
-    # Split by /
-    segments = [s for s in path_str.split('/') if s]
+    segments = tuple(s for s in path_str.strip('/').split('/') if s)
     
     return segments, has_trailing_slash
 
+def content_etag(content: dict) -> str:
+    """ETag for a content row, derived from its ID and last update time
+    updated_at is a datetime from the Postgres pool and an ISO string from PostgREST, both hash the same"""
+    updated_at = content.get('updated_at') or ''
+    if isinstance(updated_at, str) and updated_at:
+        try:
+            updated_at = datetime.fromisoformat(updated_at)
+        except ValueError:
+            pass
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    key = f"{content.get('id', '')}:{updated_at}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def listing_etag(items: List[dict]) -> str:
+    """ETag for a children listing, derived from the sorted (id, name, item_type) of its items"""
+    h = hashlib.blake2b(digest_size=16)
+    for item in sorted(items, key=lambda item: item['id']):
+        h.update(f"{item['id']}:{item['name']}:{item['item_type']}\n".encode())
+    return h.hexdigest()
+
+def listing_response(response_data: dict):
+    """JSON response for a children listing, answered with 304 when the client's ETag still matches"""
+    response = ojsonify(response_data)
+    response.set_etag(listing_etag(response_data['data']['items']))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def is_binary_value(value) -> bool:
+    """Whether value is a stored base64 BYTEA value (hex string from PostgREST, raw bytes from the Postgres pool)"""
+    return isinstance(value, (bytes, memoryview)) or (isinstance(value, str) and value.startswith('\\x'))
+
+def binary_size(value) -> int:
+    """Decoded size of a stored base64 BYTEA value ('\\x' prefix included for hex strings)
+    Estimated from the length and '=' padding, exact only for unwrapped, padded base64"""
+    if isinstance(value, str):
+        base64_len = (len(value) - 2) // 2
+        padding = 2 if value.endswith('3d3d') else 1 if value.endswith('3d') else 0  # '=' is 0x3d
+    else:
+        base64_len = len(value)
+        padding = bytes(value[-2:]).count(b'=')
+    return base64_len // 4 * 3 - padding
+
+def iter_binary(value, chunk_size: int = BINARY_STREAM_CHUNK_SIZE):
+    """Decode a stored base64 BYTEA value chunk by chunk
+    Each step covers a multiple of 4 base64 characters, so chunks decode independently"""
+    if isinstance(value, str):
+        step = chunk_size // 3 * 8  # chunk_size bytes → chunk_size / 3 * 4 base64 chars → twice as many hex chars
+        for start in range(2, len(value), step):
+            yield base64.b64decode(bytes.fromhex(value[start:start + step]))
+    else:
+        step = chunk_size // 3 * 4
+        for start in range(0, len(value), step):
+            yield base64.b64decode(value[start:start + step])
+
+def decode_binary(value, key) -> bytes:
+    """Decode a stored base64 BYTEA value (hex string from PostgREST, raw bytes from the Postgres pool)
+    Repeated requests for the same binary_id and ETag skip the decode"""
+    with _BINARY_LOCK:
+        byte_data = _BINARY_CACHE.get(key)
+    if byte_data is not None:
+        return byte_data
+    
+    # hex → base64 bytes → bytes (fromhex output feeds b64decode directly, no str copy)
+    byte_data = base64.b64decode(value if isinstance(value, (bytes, memoryview)) else bytes.fromhex(value[2:]))
+    if len(byte_data) <= RESULT_CACHE_MAX_VALUE_BYTES:
+        with _BINARY_LOCK:
+            _BINARY_CACHE[key] = byte_data
+    return byte_data
+
 # ============================================================================
 # MULTI-QUERY METHODS (Fallback approach - multiple round trips)
 # ============================================================================
@@ -107,71 +366,79 @@ def is_content(supabase: Client, item_id: str) -> bool:
         return False
     
     result = supabase.table('content').select('id').eq('id', item_id).execute()
-    return result.data and len(result.data) > 0
+    return bool(result.data)
 
-def get_children_ids(supabase: Client, parent_id: Optional[str]) -> List[str]:
-    """Get all direct children IDs of a parent (or root if parent_id is None)"""
+def get_content_ids(supabase: Client, ids: List[str]) -> set:
+    """Return the subset of ids that represent content, in a single query"""
+    if not supabase or not ids:
+        return set()
+    
+    result = supabase.table('content').select('id').in_('id', ids).execute()
+    return {row['id'] for row in (result.data or [])}
+
+def get_root_ids(supabase: Client) -> List[str]:
+    """Get IDs of all root-level segments (no direct parent relation), computed by the segment_root view"""
     if not supabase:
         return []
     
-    if parent_id is None:
-        # Root level: find all segments without a parent relation
-        # Get all segment IDs
-        all_segments = supabase.table('segment').select('id').execute()
-        all_ids = set([seg['id'] for seg in (all_segments.data or [])])
-        
-        # Get all segments that have a parent (appear as segment_2 in relations with type=0)
-        with_parent = supabase.table('segment_relation').select('segment_2').eq('type', 0).execute()
-        child_ids = set([rel['segment_2'] for rel in (with_parent.data or [])])
-        
-        # Root = all segments - segments with parents
-        root_ids = list(all_ids - child_ids)
-        return root_ids
-    else:
-        # Get children via segment_relation where parent is segment_1, type=0
-        result = supabase.table('segment_relation').select('segment_2').eq('type', 0).eq('segment_1', parent_id).execute()
-        return [rel['segment_2'] for rel in (result.data or [])]
+    result = supabase.table('segment_root').select('id').execute()
+    return [seg['id'] for seg in (result.data or [])]
 
 def resolve_path_to_id(supabase: Client, segments: List[str]) -> Optional[str]:
-    """Resolve a path of segment names to the final segment/content ID"""
+    """Resolve a path of segment names to the final segment/content ID (cached by path)"""
     if not supabase or not segments:
         return None
     
-    current_parent = None
+    key = tuple(segments)
+    with _PATH_LOCK:
+        item_id = _PATH_CACHE.get(key)
+        if item_id or key in _PATH_NEG_CACHE:
+            return item_id
     
-    for seg_name in segments:
-        # Get children of current parent
-        child_ids = get_children_ids(supabase, current_parent)
-        
-        # Find which child has the matching name
-        for child_id in child_ids:
-            # Get name from segment table
-            result = supabase.table('segment').select('name').eq('id', child_id).execute()
-            if result.data and len(result.data) > 0:
-                if result.data[0]['name'] == seg_name:
-                    current_parent = child_id
-                    break
+    item_id = _resolve_path_to_id_uncached(supabase, segments)
+    
+    with _PATH_LOCK:
+        if item_id:
+            _PATH_CACHE[key] = item_id
         else:
-            # No matching child found
-            return None
+            _PATH_NEG_CACHE[key] = True
+    return item_id
+
+def _resolve_path_to_id_uncached(supabase: Client, segments: List[str]) -> Optional[str]:
+    """Resolve the whole path with one indexed lookup on the segment_path table"""
+    try:
+        result = supabase.table('segment_path').select('id').eq('path', '/'.join(segments)).limit(1).execute()
+        if result.data:
+            return result.data[0]['id']
+    except Exception as e:
+        logger.debug("[FALLBACK] segment_path lookup failed: %s, using resolve_path", e)
     
-    return current_parent
+    # Not installed or not (yet) filled by refresh_segment_path: walk the path with the recursive CTE (misses are negative-cached)
+    result = supabase.rpc('resolve_path', {'path_segments': segments}).execute()
+    return result.data or None
+
+def find_content_for_segment(supabase: Client, seg_id: str) -> Optional[str]:
+    """Find content associated with a segment in a single query
+    Priority: bound (type=2) > direct child (type=0) > indirect child (type=1)"""
+    result = supabase.rpc('find_content_for_segment', {'seg_id': seg_id}).execute()
+    return result.data or None
 
 def get_children_multi_query(supabase: Client, segments: List[str]):
     """Get segment children using multiple queries (fallback method)"""
-    print("[METHOD] Using multi-query approach for get_children")
+    logger.debug("[METHOD] Using multi-query approach for get_children")
     
     if not segments:
         # Root level
-        root_ids = get_children_ids(supabase, None)
-        items = []
+        root_ids = get_root_ids(supabase)
+        if not root_ids:
+            return {'code': 0, 'data': {'items': []}}
         
-        for item_id in root_ids:
-            seg_data = supabase.table('segment').select('id, name').eq('id', item_id).execute()
-            if seg_data.data and len(seg_data.data) > 0:
-                item = seg_data.data[0]
-                item['item_type'] = 'content' if is_content(supabase, item_id) else 'segment'
-                items.append(item)
+        # Fetch names and classify content in one query each, concurrently
+        segs_future = _EXECUTOR.submit(
+            lambda: supabase.table('segment').select('id, name').in_('id', root_ids).execute().data or [])
+        content_ids = get_content_ids(supabase, root_ids)
+        segs = segs_future.result()
+        items = [{**seg, 'item_type': 'content' if seg['id'] in content_ids else 'segment'} for seg in segs]
         
         return {'code': 0, 'data': {'items': items}}
     
@@ -180,16 +447,9 @@ def get_children_multi_query(supabase: Client, segments: List[str]):
     if not item_id:
         return {'code': -1, 'message': 'Path does not exist'}
     
-    # Get children
-    child_ids = get_children_ids(supabase, item_id)
-    items = []
-    
-    for child_id in child_ids:
-        seg_data = supabase.table('segment').select('id, name').eq('id', child_id).execute()
-        if seg_data.data and len(seg_data.data) > 0:
-            item = seg_data.data[0]
-            item['item_type'] = 'content' if is_content(supabase, child_id) else 'segment'
-            items.append(item)
+    # Get children with name and item type in a single query
+    result = supabase.rpc('get_children_with_type', {'parent_id': item_id}).execute()
+    items = [{'id': row['id'], 'name': row['name'], 'item_type': row['item_type']} for row in (result.data or [])]
     
     return {'code': 0, 'data': {'items': items, 'segment_id': item_id}}
 
@@ -197,7 +457,7 @@ def get_content_multi_query(supabase: Client, segments: List[str]):
     """Get content using multiple queries (fallback method)
     New logic: Uses bind relationship (type=2) instead of empty name convention
     Priority: bound content > direct child content > indirect child content"""
-    print("[METHOD] Using multi-query approach for get_content")
+    logger.debug("[METHOD] Using multi-query approach for get_content")
     
     item_id = resolve_path_to_id(supabase, segments)
     
@@ -208,42 +468,14 @@ def get_content_multi_query(supabase: Client, segments: List[str]):
     if is_content(supabase, item_id):
         content_id = item_id
     else:
-        # Item is a segment, look for associated content
-        # Priority: bound (type=2) > direct child (type=0) > indirect child (type=1)
-        content_id = None
-        
-        # Try bound content first (type=2, highest priority)
-        bind_result = supabase.table('segment_relation').select('segment_2').eq('segment_1', item_id).eq('type', 2).limit(1).execute()
-        if bind_result.data and len(bind_result.data) > 0:
-            candidate_id = bind_result.data[0]['segment_2']
-            if is_content(supabase, candidate_id):
-                content_id = candidate_id
-        
-        # If no bound content, try direct child content (type=0)
-        if not content_id:
-            direct_result = supabase.table('segment_relation').select('segment_2').eq('segment_1', item_id).eq('type', 0).execute()
-            if direct_result.data:
-                for rel in direct_result.data:
-                    candidate_id = rel['segment_2']
-                    if is_content(supabase, candidate_id):
-                        content_id = candidate_id
-                        break
-        
-        # If no direct child content, try indirect child content (type=1)
-        if not content_id:
-            indirect_result = supabase.table('segment_relation').select('segment_2').eq('segment_1', item_id).eq('type', 1).execute()
-            if indirect_result.data:
-                for rel in indirect_result.data:
-                    candidate_id = rel['segment_2']
-                    if is_content(supabase, candidate_id):
-                        content_id = candidate_id
-                        break
+        # Item is a segment, look for its associated content
+        content_id = find_content_for_segment(supabase, item_id)
         
         if not content_id:
             return {'code': -2, 'message': 'Content not found (no bound, direct, or indirect child content)'}
     
     # Get content data
-    content_result = supabase.table('content').select('*').eq('id', content_id).execute()
+    content_result = supabase.table('content').select('id, type_code, value, updated_at').eq('id', content_id).execute()
     
     if not content_result.data:
         return {'code': -3, 'message': 'Content not found'}
@@ -253,20 +485,15 @@ def get_content_multi_query(supabase: Client, segments: List[str]):
     value = content.get('value', '')
     
     # Check if this is a binary reference
-    if value.startswith('binary:'):
-        binary_id = value[7:]  # Remove "binary:" prefix
-        binary_result = supabase.table('content_binary').select('*').eq('id', binary_id).execute()
+    if (binary_id := value.removeprefix('binary:')) != value:
+        binary_result = supabase.table('content_binary').select('data').eq('id', binary_id).execute()
         
         if not binary_result.data:
             return {'code': -4, 'message': f'Binary data not found for ID {binary_id}'}
         
         binary_data = binary_result.data[0]
         # Determine content type from type_code (should query content_type table)
-        content_type = 'application/octet-stream'
-        if type_code == 10:
-            content_type = 'image/png'
-        elif type_code == 21:
-            content_type = 'application/pdf'
+        content_type = _CONTENT_TYPES[type_code] if type_code in _BINARY_TYPES else 'application/octet-stream'
         
         return {
             'code': 0,
@@ -274,19 +501,13 @@ def get_content_multi_query(supabase: Client, segments: List[str]):
                 'content': content,
                 'content_type': content_type,
                 'value': binary_data.get('data'),
-                'is_binary': True
+                'is_binary': True,
+                'binary_id': binary_id
             }
         }
     
     # Map type_code to content type (should query content_type table)
-    content_type_map = {
-        1: 'text/plain',
-        2: 'text/html',
-        3: 'text/markdown',
-        10: 'image/png',  # Legacy base64 images
-        21: 'application/pdf',  # Legacy base64 PDFs
-    }
-    content_type = content_type_map.get(type_code, 'text/plain')
+    content_type = _CONTENT_TYPES.get(type_code, 'text/plain')
     
     return {'code': 0, 'data': {'content': content, 'content_type': content_type, 'value': value, 'is_binary': False}}
 
@@ -294,65 +515,55 @@ def get_content_multi_query(supabase: Client, segments: List[str]):
 # POSTGRESQL FUNCTION METHODS (Primary approach - single query)
 # ============================================================================
 
+@cache_result('children')
 def get_children_pg_function(supabase: Client, segments: List[str]):
     """Get segment children using PostgreSQL function (single query)"""
-    print("[METHOD] Using PostgreSQL function for get_children")
+    logger.debug("[METHOD] Using PostgreSQL function for get_children")
     
     try:
-        result = supabase.rpc('get_segment_children', {'path_segments': segments}).execute()
-        if result.data is not None:
-            items = [{'id': row['id'], 'name': row['name'], 'item_type': row['item_type']} for row in result.data]
+        rows = call_path_function(supabase, 'get_segment_children', segments)
+        if rows is not None:
+            items = [{'id': row['id'], 'name': row['name'], 'item_type': row['item_type']} for row in rows]
             return {'code': 0, 'data': {'items': items}}
         return {'code': -1, 'message': 'No data returned'}
     except Exception as e:
         return {'code': -5, 'message': str(e)}
 
+@cache_result('content')
 def get_content_pg_function(supabase: Client, segments: List[str]):
     """Get content using PostgreSQL function (single query)"""
-    print("[METHOD] Using PostgreSQL function for get_content")
+    logger.debug("[METHOD] Using PostgreSQL function for get_content")
     
     try:
-        result = supabase.rpc('get_content_by_path', {'path_segments': segments}).execute()
-        if result.data and len(result.data) > 0:
-            content = result.data[0]
+        rows = call_path_function(supabase, 'get_content_by_path', segments)
+        if rows:
+            content = rows[0]
+            # Binary data is joined into the same row by get_content_by_path
+            binary_data = content.pop('binary_data', None)
             type_code = content.get('type_code', 1)
             value = content.get('value', '')
             
             # Check if this is a binary reference
-            if value.startswith('binary:'):
-                binary_id = value[7:]  # Remove "binary:" prefix
-                binary_result = supabase.table('content_binary').select('*').eq('id', binary_id).execute()
-                
-                if not binary_result.data:
+            if (binary_id := value.removeprefix('binary:')) != value:
+                if binary_data is None:
                     return {'code': -4, 'message': f'Binary data not found for ID {binary_id}'}
                 
-                binary_data = binary_result.data[0]
                 # Determine content type from type_code (should query content_type table)
-                content_type = 'application/octet-stream'
-                if type_code == 10:
-                    content_type = 'image/png'
-                elif type_code == 21:
-                    content_type = 'application/pdf'
+                content_type = _CONTENT_TYPES[type_code] if type_code in _BINARY_TYPES else 'application/octet-stream'
                 
                 return {
                     'code': 0,
                     'data': {
                         'content': content,
                         'content_type': content_type,
-                        'value': binary_data.get('data'),
-                        'is_binary': True
+                        'value': binary_data,
+                        'is_binary': True,
+                        'binary_id': binary_id
                     }
                 }
             
             # Map type_code to content type (should query content_type table)
-            content_type_map = {
-                1: 'text/plain',
-                2: 'text/html',
-                3: 'text/markdown',
-                10: 'image/png',  # Legacy base64 images
-                21: 'application/pdf',  # Legacy base64 PDFs
-            }
-            content_type = content_type_map.get(type_code, 'text/plain')
+            content_type = _CONTENT_TYPES.get(type_code, 'text/plain')
             
             return {
                 'code': 0,
@@ -367,74 +578,135 @@ def get_content_pg_function(supabase: Client, segments: List[str]):
     except Exception as e:
         return {'code': -5, 'message': str(e)}
 
-def fetch_tree(supabase: Client, segment_id: str):
+def get_root_children(supabase: Client):
+    """Get root-level items using get_root_segments (single query, cached for a few seconds)"""
+    with _ROOT_LOCK:
+        items = _ROOT_CACHE.get('items')
+    if items is not None:
+        return {'code': 0, 'data': {'items': items}}
+    
+    try:
+        result = supabase.rpc('get_root_segments').execute()
+        if result.data is None:
+            return {'code': -1, 'message': 'No data returned'}
+        items = [{'id': row['id'], 'name': row['name'], 'item_type': row['item_type']} for row in result.data]
+    except Exception as e:
+        return {'code': -5, 'message': str(e)}
+    
+    with _ROOT_LOCK:
+        _ROOT_CACHE['items'] = items
+    return {'code': 0, 'data': {'items': items}}
+
+def fetch_tree(supabase: Client, segment_id: str, max_depth: int = TREE_MAX_DEPTH):
     """
-    Fetch full tree structure for a segment using PostgreSQL function
-    Returns nested JSON with all direct children recursively
+    Fetch tree structure for a segment using PostgreSQL function
+    Returns nested JSON with direct children recursively, up to max_depth levels
     """
     try:
-        print(f"[fetch_tree] Fetching tree for segment_id: {segment_id}")
-        response = supabase.rpc('get_segment_tree', {'root_segment_id': segment_id}).execute()
+        logger.debug("[fetch_tree] Fetching tree for segment_id: %s, max_depth: %s", segment_id, max_depth)
+        response = supabase.rpc('get_segment_tree', {'root_segment_id': segment_id, 'max_depth': max_depth}).execute()
         
         if response.data is not None:
-            print(f"[fetch_tree] Successfully fetched tree for segment_id: {segment_id}")
+            logger.debug("[fetch_tree] Successfully fetched tree for segment_id: %s", segment_id)
             return {
                 'code': 0,
                 'message': 'Tree fetched successfully',
                 'data': response.data
             }
-        print(f"[fetch_tree] No data returned for segment_id: {segment_id}")
+        logger.debug("[fetch_tree] No data returned for segment_id: %s", segment_id)
         return {'code': -1, 'message': 'Failed to fetch tree'}
     except Exception as e:
-        print(f"[fetch_tree] Exception for segment_id {segment_id}: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[fetch_tree] Exception for segment_id %s: %s: %s", segment_id, type(e).__name__, e)
         return {'code': -5, 'message': str(e)}
 
     
 
-@app.route('/', defaults={'path': ''})
+@app.route('/', methods=['GET'])
+def handle_root():
+    """Handle root listing directly, without generic path parsing and resolution"""
+    args = request.args
+    if not verify_token(args.get('token', ''), 'GET'):
+        return ojsonify({'code': -2, 'message': 'Invalid or missing token'}, 401)
+    
+    supabase = get_supabase_client()
+    if not supabase:
+        return ojsonify({'code': -3, 'message': 'Supabase client not initialized'}, 500)
+    
+    if args.get('fetch_type', 'normal') == 'tree':
+        return ojsonify({'code': -1, 'message': 'Cannot fetch tree for root'}, 400)
+    
+    try:
+        result = get_root_children(supabase)
+        
+        if result['code'] < 0:
+            logger.debug("[FALLBACK] get_root_segments failed (code=%s): %s, using get_segment_children", result['code'], result.get('message', 'Unknown error'))
+            result = get_children_pg_function(supabase, [])
+        
+        if result['code'] < 0:
+            logger.debug("[FALLBACK] PG function failed (code=%s): %s, using multi-query", result['code'], result.get('message', 'Unknown error'))
+            result = get_children_multi_query(supabase, [])
+        
+        if result['code'] < 0:
+            return ojsonify({'code': result['code'], 'message': result.get('message', 'Failed to fetch root')}, 500)
+        
+        return listing_response({
+            'code': 0,
+            'message': 'Children fetched successfully',
+            'data': {
+                'type': 'segment_list',
+                'path': '/',
+                'items': result['data'].get('items', [])
+            }
+        })
+    
+    except Exception as e:
+        logger.exception("Exception processing request: %s", e)
+        return ojsonify({'error': 'Server error', 'message': str(e)}, 500)
+
 @app.route('/<path:path>')
 def handle_path(path):
     """Handle all path requests"""
-    if not verify_token('GET'):
-        return jsonify({'code': -2, 'message': 'Invalid or missing token'}), 401
+    # Read query parameters once
+    args = request.args
+    fetch_type = args.get('fetch_type', 'normal')
+    
+    if not verify_token(args.get('token', ''), 'GET'):
+        return ojsonify({'code': -2, 'message': 'Invalid or missing token'}, 401)
     
-    # Create a new Supabase client for this request
+    # Shared Supabase client (pooled connections)
     supabase = get_supabase_client()
     if not supabase:
-        return jsonify({'code': -3, 'message': 'Supabase client not initialized'}), 500
+        return ojsonify({'code': -3, 'message': 'Supabase client not initialized'}, 500)
     
-    full_path = '/' + path if path else '/'
+    full_path = '/' + path
     segments, has_trailing_slash = parse_path(full_path)
+    segments = list(segments)
     
-    # Check for fetch_type parameter
-    fetch_type = request.args.get('fetch_type', 'normal')
-    
-    print(f"[GET] {full_path} → segments={segments}, trailing_slash={has_trailing_slash}, fetch_type={fetch_type}")
+    logger.debug("[GET] %s → segments=%s, trailing_slash=%s, fetch_type=%s", full_path, segments, has_trailing_slash, fetch_type)
     
     try:
         # Handle tree fetch request
         if fetch_type == 'tree' and has_trailing_slash:
             # Get segment ID by resolving path
             if len(segments) == 0:
-                return jsonify({'code': -1, 'message': 'Cannot fetch tree for root'}), 400
+                return ojsonify({'code': -1, 'message': 'Cannot fetch tree for root'}, 400)
             
             # Resolve path to get segment ID
             segment_id = resolve_path_to_id(supabase, segments)
             if not segment_id:
-                print(f"[ERROR] Segment not found for path: {segments}")
-                return jsonify({'code': -1, 'message': 'Segment not found'}), 404
+                logger.debug("Segment not found for path: %s", segments)
+                return ojsonify({'code': -1, 'message': 'Segment not found'}, 404)
             
-            print(f"[DEBUG] Resolved path {segments} to segment_id: {segment_id}")
+            logger.debug("Resolved path %s to segment_id: %s", segments, segment_id)
             
             # Fetch tree structure
-            tree_result = fetch_tree(supabase, segment_id)
+            max_depth = max(1, min(args.get('depth', TREE_MAX_DEPTH, type=int), TREE_MAX_DEPTH_LIMIT))
+            tree_result = fetch_tree(supabase, segment_id, max_depth)
             if tree_result['code'] < 0:
-                print(f"[ERROR] fetch_tree failed with code {tree_result['code']}: {tree_result.get('message')}")
-                return jsonify({'code': tree_result['code'], 'message': tree_result.get('message', 'Failed to fetch tree')}), 500
+                logger.error("fetch_tree failed with code %s: %s", tree_result['code'], tree_result.get('message'))
+                return ojsonify({'code': tree_result['code'], 'message': tree_result.get('message', 'Failed to fetch tree')}, 500)
             
-            return jsonify({
+            return ojsonify({
                 'code': 0,
                 'message': 'Tree fetched successfully',
                 'data': {
@@ -451,11 +723,11 @@ def handle_path(path):
             result = get_children_pg_function(supabase, segments)
             
             if result['code'] < 0:
-                print(f"[FALLBACK] PG function failed (code={result['code']}): {result.get('message', 'Unknown error')}, using multi-query")
+                logger.debug("[FALLBACK] PG function failed (code=%s): %s, using multi-query", result['code'], result.get('message', 'Unknown error'))
                 result = get_children_multi_query(supabase, segments)
             
             if result['code'] < 0:
-                return jsonify({'code': result['code'], 'message': result.get('message', 'Path does not exist')}), 404
+                return ojsonify({'code': result['code'], 'message': result.get('message', 'Path does not exist')}, 404)
             
             data = result.get('data', {})
             response_data = {
@@ -470,7 +742,7 @@ def handle_path(path):
             if 'segment_id' in data:
                 response_data['data']['segment_id'] = data['segment_id']
             
-            return jsonify(response_data)
+            return listing_response(response_data)
         
         # No trailing slash → treat as content
         else:
@@ -478,62 +750,72 @@ def handle_path(path):
             result = get_content_pg_function(supabase, segments)
             
             if result['code'] < 0:
-                print(f"[FALLBACK] PG function failed (code={result['code']}): {result.get('message', 'Unknown error')}, using multi-query")
+                logger.debug("[FALLBACK] PG function failed (code=%s): %s, using multi-query", result['code'], result.get('message', 'Unknown error'))
                 result = get_content_multi_query(supabase, segments)
             
             if result['code'] < 0:
-                return jsonify({'code': result['code'], 'message': result.get('message', 'Content not found')}), 404
+                return ojsonify({'code': result['code'], 'message': result.get('message', 'Content not found')}, 404)
             
             data = result.get('data', {})
             content_type = data.get('content_type', 'text/plain')
             value = data.get('value', '')
             is_binary = data.get('is_binary', False)
             
+            # Unchanged content → 304 without decoding or sending the body
+            etag = content_etag(data.get('content', {}))
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            
             # Handle binary data (images, PDFs, etc.)
-            if is_binary:
+            elif is_binary:
                 # Supabase returns BYTEA as hex-encoded string with \x prefix
                 # Storage format: Uint8Array → base64 → BYTEA (hex-encoded by Supabase)
-                if isinstance(value, str) and value.startswith('\\x'):
-                    import base64
-                    # Decode: hex → UTF-8 string (base64) → bytes
-                    hex_str = value[2:]  # Remove \x prefix
-                    base64_str = bytes.fromhex(hex_str).decode('utf-8')
-                    byte_data = base64.b64decode(base64_str)
-                    return Response(byte_data, mimetype=content_type)
+                # The direct Postgres pool returns it as raw bytes (the stored base64 text) instead
+                if is_binary_value(value) and binary_size(value) > BINARY_STREAM_MIN_SIZE:
+                    # Large payload: decode and send chunk by chunk instead of materializing the whole file
+                    # No Content-Length: the size is estimated from the padding and only picks this branch,
+                    # a wrong header would truncate or hang the response (sent chunked instead)
+                    response = Response(iter_binary(value), mimetype=content_type)
+                elif is_binary_value(value):
+                    # Small payload: decoded once per binary_id
+                    byte_data = decode_binary(value, (data.get('binary_id'), etag))
+                    response = Response(byte_data, mimetype=content_type)
                 else:
-                    return Response(value, mimetype=content_type)
+                    response = Response(value, mimetype=content_type)
             
             # Return content based on content type
-            if content_type.startswith('application/json'):
+            elif content_type.startswith('application/json'):
                 try:
-                    json_value = json.loads(value) if isinstance(value, str) else value
-                    return jsonify(json_value)
+                    json_value = orjson.loads(value) if isinstance(value, str) else value
+                    response = ojsonify(json_value)
                 except:
-                    return Response(value, mimetype=content_type)
-            elif content_type.startswith('text/'):
-                return Response(value, mimetype=content_type)
+                    response = Response(value, mimetype=content_type)
             else:
-                return Response(value, mimetype=content_type)
+                response = Response(value, mimetype=content_type)
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = f'private, max-age={CONTENT_MAX_AGE}'
+            return response
     
     except Exception as e:
-        print(f"[ERROR] Exception processing request: {e}")
-        return jsonify({'error': 'Server error', 'message': str(e)}), 500
+        logger.exception("Exception processing request: %s", e)
+        return ojsonify({'error': 'Server error', 'message': str(e)}, 500)
 
 @app.route('/ping')
 def ping():
     """Ping endpoint to test server connection and token validity"""
-    token_valid = verify_token('GET')
+    token_valid = verify_token(request.args.get('token', ''), 'GET')
     
     if not token_valid:
-        return jsonify({
+        return ojsonify({
             'code': 1,
             'message': 'Server is reachable but token is invalid'
         })
     
     # Test Supabase client creation
-    supabase_configured = CONFIG.get('project_url') and CONFIG.get('anon_key')
+    supabase_configured = CFG.project_url and CFG.anon_key
     
-    return jsonify({
+    return ojsonify({
         'code': 0,
         'message': 'Connection successful',
         'data': {
@@ -541,26 +823,47 @@ def ping():
         }
     })
 
+@app.route('/admin/flush-cache', methods=['POST'])
+def flush_cache():
+    """Flush server-side caches (call after writes to the database)"""
+    if not verify_token(request.args.get('token', ''), 'POST'):
+        return ojsonify({'error': 'Unauthorized', 'message': 'Invalid or missing token'}, 401)
+    
+    with _PATH_LOCK:
+        _PATH_CACHE.clear()
+        _PATH_NEG_CACHE.clear()
+    with _ROOT_LOCK:
+        _ROOT_CACHE.clear()
+    with _RESULT_LOCK:
+        _RESULT_CACHE.clear()
+    with _BINARY_LOCK:
+        _BINARY_CACHE.clear()
+    
+    return ojsonify({'code': 0, 'message': 'Cache flushed'})
+
 @app.route('/api/test', methods=['POST'])
 def test_post():
     """Test POST endpoint"""
-    if not verify_token('POST'):
-        return jsonify({'error': 'Unauthorized', 'message': 'Invalid or missing token'}), 401
+    if not verify_token(request.args.get('token', ''), 'POST'):
+        return ojsonify({'error': 'Unauthorized', 'message': 'Invalid or missing token'}, 401)
     
     data = request.get_json() or {}
-    print(f"[POST] /api/test → {data}")
+    logger.debug("[POST] /api/test → %s", data)
     
-    return jsonify({
+    return ojsonify({
         'status': 'success',
         'message': 'POST request received',
         'received_data': data,
         'token_valid': True
     })
 
+# Configure logging and load config at import so each WSGI worker creates its pooled Supabase client once
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+load_config()
+
 if __name__ == '__main__':
-    load_config()
     print(f"GET_TOKEN: {GET_TOKEN}")
     print(f"POST_TOKEN: {POST_TOKEN}")
-    print(f"Supabase configured: {CONFIG.get('project_url') and CONFIG.get('anon_key')}")
-    # Enable threaded mode to handle concurrent requests
-    app.run(host='0.0.0.0', port=18100, debug=True, threaded=True)
+    print(f"Supabase configured: {CFG.project_url and CFG.anon_key}")
+    # Development server only; in production run wsgi.py under gunicorn
+    app.run(host='0.0.0.0', port=18100, threaded=True)
@@ -0,0 +1,22 @@
+"""WSGI entry point for production
+
+Run from the server directory:
+    gunicorn -k gthread --threads 16 --workers 2 --bind 0.0.0.0:18100 wsgi:app
+
+Importing main loads the config, so every worker builds its own pooled Supabase client once.
+
+Configuration:
+    config.json / config.0.json   project_url, anon_key, optional database_url
+    GET_TOKEN, POST_TOKEN         access tokens for GET requests and admin POSTs
+    DATABASE_URL                  optional Postgres DSN (overrides database_url); hot SQL functions then
+                                  run over a direct connection pool instead of PostgREST
+    NEGATIVE_CACHE_TTL            seconds a missing path stays cached as 404 (default 5, at most 15)
+    LOG_LEVEL                     logging level (default INFO)
+
+Optional packages:
+    h2                            HTTP/2 to Supabase (pip install httpx[http2])
+    psycopg, psycopg_pool         direct Postgres pool for DATABASE_URL (pip install "psycopg[binary,pool]")
+"""
+from main import app
+
+__all__ = ['app']
@@ -96,6 +96,7 @@ CREATE TABLE IF NOT EXISTS segment (
 
 -- Indexes for efficient queries
 CREATE INDEX IF NOT EXISTS idx_segment_name ON segment(name);
+CREATE INDEX IF NOT EXISTS idx_segment_id_name ON segment(id) INCLUDE (name);  -- Index-only child name lookups (path walk, listings)
 CREATE INDEX IF NOT EXISTS idx_segment_isContent ON segment("isContent");
 
 -- Trigger for updated_at
@@ -155,6 +156,7 @@ CREATE INDEX IF NOT EXISTS idx_segment_relation_2 ON segment_relation(segment_2)
 CREATE INDEX IF NOT EXISTS idx_segment_relation_type_1 ON segment_relation(type, segment_1);
 CREATE INDEX IF NOT EXISTS idx_segment_relation_type_2 ON segment_relation(type, segment_2);
 CREATE INDEX IF NOT EXISTS idx_segment_relation_rank ON segment_relation(segment_1, type, rank) WHERE type = 0;
+CREATE INDEX IF NOT EXISTS idx_segment_relation_2_direct ON segment_relation(segment_2) WHERE type = 0;  -- Root lookups (has direct parent?)
 `.trim()
 }
 
@@ -57,6 +57,35 @@ END;
 $$ LANGUAGE plpgsql STABLE;
 `
 
+/**
+ * Get root-level segment IDs, names and item types in one query
+ * Set difference is computed on the server with an anti-join instead of shipping both tables to the client
+ */
+export const createGetRootSegmentsFunction = () => `-- View: Root-level segments
+-- Segments without a direct parent relationship (NOT EXISTS anti-join, index-only on idx_segment_relation_2_direct)
+-- The content join is removed by the planner when item_type is not selected
+CREATE OR REPLACE VIEW segment_root AS
+SELECT
+  s.id,
+  s.name,
+  CASE WHEN c.id IS NOT NULL THEN 'content' ELSE 'segment' END AS item_type
+FROM segment s
+LEFT JOIN content c ON c.id = s.id
+WHERE NOT EXISTS (
+  SELECT 1 FROM segment_relation sr
+  WHERE sr.segment_2 = s.id AND sr.type = 0
+);
+
+-- Function: Get all root-level segments
+-- Returns id, name and item_type of every root segment in a single round trip
+CREATE OR REPLACE FUNCTION get_root_segments()
+RETURNS SETOF segment_root AS $$
+BEGIN
+  RETURN QUERY SELECT * FROM segment_root;
+END;
+$$ LANGUAGE plpgsql STABLE;
+`
+
 /**
  * Get path to root for a segment in one query using recursive CTE
  * Much more efficient than multiple sequential queries
@@ -88,120 +117,230 @@ FROM parent_chain;
 $$ LANGUAGE sql STABLE;
 `
 
-export const createGetContentByPathFunction = () => `-- Function: Get content by path
--- Returns content data for a given path (e.g., ['name', 'en'])
--- New logic: Uses bind relationship (type=2) instead of empty name convention
--- Priority: bound content > direct child content > indirect child content
-CREATE OR REPLACE FUNCTION get_content_by_path(path_segments TEXT[])
-RETURNS TABLE(
-  id TEXT,
-  type_code INTEGER,
-  type_name TEXT,
-  value TEXT,
-  created_at TIMESTAMP,
-  updated_at TIMESTAMP,
-  metadata JSONB
-) AS $$
+/**
+ * Resolve a path of segment names to an ID in one query using recursive CTE
+ * Replaces walking the path level by level from the client
+ */
+export const createResolvePathFunction = () => `-- Function: Resolve path to ID
+-- Walks path segments from the root in a single recursive CTE
+-- Returns the final segment/content ID, or NULL if the path does not exist
+CREATE OR REPLACE FUNCTION resolve_path(path_segments TEXT[])
+RETURNS TEXT AS $$
+WITH RECURSIVE walk AS (
+  -- Base case: root-level segment (no direct parent) matching the first name
+  SELECT 
+    s.id,
+    1 AS depth
+  FROM segment s
+  WHERE s.name = path_segments[1]
+    AND NOT EXISTS (
+      SELECT 1 FROM segment_relation sr
+      WHERE sr.segment_2 = s.id AND sr.type = 0
+    )
+  
+  UNION ALL
+  
+  -- Recursive case: direct child matching the next name
+  SELECT 
+    s.id,
+    w.depth + 1 AS depth
+  FROM walk w
+  INNER JOIN segment_relation sr ON sr.segment_1 = w.id AND sr.type = 0
+  INNER JOIN segment s ON s.id = sr.segment_2 AND s.name = path_segments[w.depth + 1]
+  WHERE w.depth < array_length(path_segments, 1)
+)
+SELECT id
+FROM walk
+WHERE depth = array_length(path_segments, 1)
+LIMIT 1;
+$$ LANGUAGE sql STABLE;
+`
+
+/**
+ * Maintain the segment_path table (pre-computed path cache), kept up to date by triggers
+ * Turns path resolution into a single indexed lookup: SELECT id FROM segment_path WHERE path = 'a/b/c'
+ */
+export const createSegmentPathFunction = () => `-- Remove the segment.path column of the previous version (paths now live in the segment_path table)
+DROP INDEX IF EXISTS idx_segment_path;
+ALTER TABLE segment DROP COLUMN IF EXISTS path;
+
+-- Function: Recompute segment_path of a segment and all of its direct descendants
+-- The start path is built by walking up direct parent relations (no parent = root)
+-- A segment with several direct parents uses the one with the lowest relation id, so paths are deterministic
+-- Requires the segment_path table
+CREATE OR REPLACE FUNCTION refresh_segment_path(start_id TEXT)
+RETURNS VOID AS $$
 DECLARE
-  current_id TEXT := NULL;
-  seg_name TEXT;
-  content_id TEXT;
-  is_root BOOLEAN := TRUE;
+  start_path TEXT;
 BEGIN
-  -- Walk through path segments to find the target segment
-  FOREACH seg_name IN ARRAY path_segments
-  LOOP
-    -- Find child segment/content with matching name
-    IF is_root THEN
-      -- Root level: find segment without parent relation
-      SELECT s.id INTO current_id
-      FROM segment s
-      WHERE s.name = seg_name
-        AND NOT EXISTS (
-          SELECT 1 FROM segment_relation sr
-          WHERE sr.segment_2 = s.id AND sr.type = 0
-        )
-      LIMIT 1;
-      is_root := FALSE;
-    ELSE
-      -- Find child of current segment
-      SELECT s.id INTO current_id
-      FROM segment s
-      INNER JOIN segment_relation sr ON sr.segment_2 = s.id
-      WHERE sr.segment_1 = current_id
-        AND sr.type = 0
-        AND s.name = seg_name
-      LIMIT 1;
-    END IF;
+  WITH RECURSIVE ancestors AS (
+    SELECT s.id, s.name, 0 AS depth
+    FROM segment s
+    WHERE s.id = start_id
     
-    -- If not found, return empty
-    IF current_id IS NULL THEN
-      RETURN;
-    END IF;
-  END LOOP;
+    UNION ALL
+    
+    SELECT p.id, p.name, a.depth + 1 AS depth
+    FROM ancestors a
+    INNER JOIN LATERAL (
+      SELECT sr.segment_1
+      FROM segment_relation sr
+      WHERE sr.segment_2 = a.id AND sr.type = 0
+      ORDER BY sr.id
+      LIMIT 1
+    ) parent ON TRUE
+    INNER JOIN segment p ON p.id = parent.segment_1
+    WHERE a.depth < 100  -- Prevent infinite loops
+  )
+  SELECT string_agg(name, '/' ORDER BY depth DESC) INTO start_path
+  FROM ancestors;
   
-  -- Check if current_id is already content
-  IF EXISTS (SELECT 1 FROM content WHERE content.id = current_id) THEN
-    -- Return this content directly
-    RETURN QUERY
-    SELECT c.id, c.type_code, ct.type_name, c.value, c.created_at, c.updated_at, c.metadata
-    FROM content c
-    LEFT JOIN content_type ct ON ct.type_code = c.type_code
-    WHERE c.id = current_id;
+  IF start_path IS NULL THEN
     RETURN;
   END IF;
   
-  -- Current is segment, look for bound content (type=2, highest priority)
-  SELECT sr.segment_2 INTO content_id
-  FROM segment_relation sr
-  INNER JOIN content c ON c.id = sr.segment_2
-  WHERE sr.segment_1 = current_id
-    AND sr.type = 2  -- parent_child_bind
-  LIMIT 1;
-  
-  IF content_id IS NOT NULL THEN
-    RETURN QUERY
-    SELECT c.id, c.type_code, ct.type_name, c.value, c.created_at, c.updated_at, c.metadata
-    FROM content c
-    LEFT JOIN content_type ct ON ct.type_code = c.type_code
-    WHERE c.id = content_id;
-    RETURN;
+  WITH RECURSIVE subtree AS (
+    -- Base case: start segment
+    SELECT start_id AS id, start_path AS path, 1 AS depth
+    
+    UNION ALL
+    
+    -- Recursive case: direct children whose first direct parent is this node
+    SELECT 
+      s.id,
+      st.path || '/' || s.name AS path,
+      st.depth + 1 AS depth
+    FROM subtree st
+    INNER JOIN segment_relation sr ON sr.segment_1 = st.id AND sr.type = 0
+    INNER JOIN segment s ON s.id = sr.segment_2
+    WHERE st.depth < 100  -- Prevent infinite loops
+      AND sr.id = (
+        SELECT r.id FROM segment_relation r
+        WHERE r.segment_2 = s.id AND r.type = 0
+        ORDER BY r.id
+        LIMIT 1
+      )
+  )
+  INSERT INTO segment_path (id, path)
+  SELECT id, path FROM subtree
+  ON CONFLICT (id) DO UPDATE
+  SET path = EXCLUDED.path
+  WHERE segment_path.path IS DISTINCT FROM EXCLUDED.path;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger: Refresh paths when a direct parent relation is added, moved or removed
+-- A parent without a stored path yet (e.g. a root that had no children) is refreshed together with its new child
+CREATE OR REPLACE FUNCTION segment_path_on_relation_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.type = 0 THEN
+    PERFORM refresh_segment_path(OLD.segment_2);
   END IF;
-  
-  -- No bound content, look for direct child content (type=0, medium priority)
-  SELECT sr.segment_2 INTO content_id
-  FROM segment_relation sr
-  INNER JOIN content c ON c.id = sr.segment_2
-  WHERE sr.segment_1 = current_id
-    AND sr.type = 0  -- parent_child_direct
-  LIMIT 1;
-  
-  IF content_id IS NOT NULL THEN
-    RETURN QUERY
-    SELECT c.id, c.type_code, ct.type_name, c.value, c.created_at, c.updated_at, c.metadata
-    FROM content c
-    LEFT JOIN content_type ct ON ct.type_code = c.type_code
-    WHERE c.id = content_id;
-    RETURN;
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.type = 0 THEN
+    IF NOT EXISTS (SELECT 1 FROM segment_path sp WHERE sp.id = NEW.segment_1) THEN
+      PERFORM refresh_segment_path(NEW.segment_1);
+    ELSE
+      PERFORM refresh_segment_path(NEW.segment_2);
+    END IF;
   END IF;
-  
-  -- No direct child content, look for indirect child content (type=1, lowest priority)
-  SELECT sr.segment_2 INTO content_id
-  FROM segment_relation sr
-  INNER JOIN content c ON c.id = sr.segment_2
-  WHERE sr.segment_1 = current_id
-    AND sr.type = 1  -- parent_child_indirect
-  LIMIT 1;
-  
-  IF content_id IS NOT NULL THEN
-    RETURN QUERY
-    SELECT c.id, c.type_code, ct.type_name, c.value, c.created_at, c.updated_at, c.metadata
-    FROM content c
-    LEFT JOIN content_type ct ON ct.type_code = c.type_code
-    WHERE c.id = content_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS segment_relation_refresh_path ON segment_relation;
+CREATE TRIGGER segment_relation_refresh_path
+  AFTER INSERT OR UPDATE OR DELETE ON segment_relation
+  FOR EACH ROW
+  EXECUTE FUNCTION segment_path_on_relation_change();
+
+-- Trigger: Refresh paths when a segment is renamed, or created with a direct parent already in place
+-- A new segment without one is not stored yet: its parent relation usually follows in a separate request,
+-- and storing it as a root meanwhile would shadow a real root of the same name
+CREATE OR REPLACE FUNCTION segment_path_on_segment_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' AND NOT EXISTS (
+    SELECT 1 FROM segment_relation sr
+    WHERE sr.segment_2 = NEW.id AND sr.type = 0
+  ) THEN
+    RETURN NULL;
   END IF;
+  PERFORM refresh_segment_path(NEW.id);
+  RETURN NULL;
 END;
-$$ LANGUAGE plpgsql;`
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS segment_refresh_path ON segment;
+CREATE TRIGGER segment_refresh_path
+  AFTER INSERT OR UPDATE OF name ON segment
+  FOR EACH ROW
+  EXECUTE FUNCTION segment_path_on_segment_change();
+
+-- Backfill: refresh every root segment (covers all of their descendants)
+SELECT refresh_segment_path(s.id)
+FROM segment s
+WHERE NOT EXISTS (
+  SELECT 1 FROM segment_relation sr
+  WHERE sr.segment_2 = s.id AND sr.type = 0
+);
+`
+
+/**
+ * Find the content associated with a segment ID in one query
+ * Only candidates that exist in content are considered, ordered by relation priority
+ */
+export const createFindContentForSegmentFunction = () => `-- Function: Find content for a segment
+-- Returns the content ID associated with a segment, or NULL if none
+-- Priority: bound content (type=2) > direct child content (type=0) > indirect child content (type=1)
+CREATE OR REPLACE FUNCTION find_content_for_segment(seg_id TEXT)
+RETURNS TEXT AS $$
+  SELECT r.segment_2
+  FROM segment_relation r
+  INNER JOIN content c ON c.id = r.segment_2
+  WHERE r.segment_1 = seg_id
+    AND r.type IN (0, 1, 2)
+  ORDER BY CASE r.type WHEN 2 THEN 0 WHEN 0 THEN 1 ELSE 2 END
+  LIMIT 1;
+$$ LANGUAGE sql STABLE;
+`
+
+export const createGetContentByPathFunction = () => `-- Drop previous version (return type changed: binary_data column added)
+DROP FUNCTION IF EXISTS get_content_by_path(TEXT[]);
+
+-- Function: Get content by path
+-- Returns content data for a given path (e.g., ['name', 'en'])
+-- New logic: Uses bind relationship (type=2) instead of empty name convention
+-- Priority: path itself is content > bound content > direct child content > indirect child content
+-- Binary content (value = 'binary:<id>') includes its content_binary data in the same row
+-- Requires resolve_path() and find_content_for_segment()
+CREATE OR REPLACE FUNCTION get_content_by_path(path_segments TEXT[])
+RETURNS TABLE(
+  id TEXT,
+  type_code INTEGER,
+  type_name TEXT,
+  value TEXT,
+  created_at TIMESTAMP,
+  updated_at TIMESTAMP,
+  metadata JSONB,
+  binary_data BYTEA
+) AS $$
+WITH resolved AS (
+  SELECT resolve_path(path_segments) AS id
+),
+target AS (
+  SELECT COALESCE(
+    (SELECT c.id FROM content c INNER JOIN resolved r ON c.id = r.id),
+    (SELECT find_content_for_segment(r.id) FROM resolved r)
+  ) AS id
+)
+-- Return content, joined with its binary data when value is a binary reference
+SELECT c.id, c.type_code, ct.type_name, c.value, c.created_at, c.updated_at, c.metadata, cb.data
+FROM target t
+INNER JOIN content c ON c.id = t.id
+LEFT JOIN content_type ct ON ct.type_code = c.type_code
+LEFT JOIN content_binary cb ON c.value LIKE 'binary:%' AND cb.id = substring(c.value from 8);
+$$ LANGUAGE sql STABLE;`
 
 export const createGetSegmentChildrenFunction = () => `-- Function: Get segment children by path
 -- Returns list of children (segments and content) for a given path
@@ -282,6 +421,29 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;`
 
+/**
+ * Get direct children of a segment ID with name and item type in one query
+ * Used by the server's multi-query fallback to avoid per-child lookups
+ */
+export const createGetChildrenWithTypeFunction = () => `-- Function: Get direct children of a segment with item type
+-- Returns id, name and item_type ('content' or 'segment') for every direct child
+CREATE OR REPLACE FUNCTION get_children_with_type(parent_id TEXT)
+RETURNS TABLE(
+  id TEXT,
+  name TEXT,
+  item_type TEXT
+) AS $$
+  SELECT 
+    s.id,
+    s.name,
+    CASE WHEN c.id IS NOT NULL THEN 'content' ELSE 'segment' END AS item_type
+  FROM segment_relation sr
+  INNER JOIN segment s ON s.id = sr.segment_2
+  LEFT JOIN content c ON c.id = s.id
+  WHERE sr.type = 0 AND sr.segment_1 = parent_id;
+$$ LANGUAGE sql STABLE;
+`
+
 export const createDeleteSegmentFunction = () => `-- Function: Delete segment and all its relations
 -- Deletes a segment and removes all relations where it appears as parent or child
 -- Returns the number of relations deleted
@@ -317,14 +479,22 @@ $$ LANGUAGE plpgsql;`
 
 /**
  * Get tree structure recursively from a segment
- * Returns full tree with all descendants using direct parent-child relationships
+ * Returns tree of descendants using direct parent-child relationships, limited to max_depth levels
  */
-export const createGetSegmentTreeFunction = () => `-- Helper function to build tree for a node recursively
-CREATE OR REPLACE FUNCTION build_node_tree(node_id TEXT)
+export const createGetSegmentTreeFunction = () => `-- Drop previous versions without depth parameter (signature changed)
+DROP FUNCTION IF EXISTS get_segment_tree(TEXT);
+DROP FUNCTION IF EXISTS build_node_tree(TEXT);
+
+-- Helper function to build tree for a node recursively
+-- remaining_depth: number of child levels still to expand below this node
+-- Nodes cut off at the depth limit that do have children get 'truncated': true (fetch them with a deeper request)
+CREATE OR REPLACE FUNCTION build_node_tree(node_id TEXT, remaining_depth INTEGER)
 RETURNS JSONB AS $$
 DECLARE
   node_data RECORD;
-  children_data JSONB;
+  children_data JSONB := '{}'::jsonb;
+  is_truncated BOOLEAN := FALSE;
+  node_json JSONB;
 BEGIN
   -- Get node info
   SELECT 
@@ -345,24 +515,31 @@ BEGIN
     RETURN NULL;
   END IF;
   
-  -- Get all direct children recursively
-  SELECT COALESCE(
-    jsonb_object_agg(
-      child_id,
-      build_node_tree(child_id)
-    ),
-    '{}'::jsonb
-  )
-  INTO children_data
-  FROM (
-    SELECT sr.segment_2 AS child_id
-    FROM segment_relation sr
-    WHERE sr.segment_1 = node_id AND sr.type = 0
-  ) children;
+  -- Get all direct children recursively (stop expanding at depth limit)
+  IF remaining_depth > 0 THEN
+    SELECT COALESCE(
+      jsonb_object_agg(
+        child_id,
+        build_node_tree(child_id, remaining_depth - 1)
+      ),
+      '{}'::jsonb
+    )
+    INTO children_data
+    FROM (
+      SELECT sr.segment_2 AS child_id
+      FROM segment_relation sr
+      WHERE sr.segment_1 = node_id AND sr.type = 0
+    ) children;
+  ELSE
+    is_truncated := EXISTS (
+      SELECT 1 FROM segment_relation sr
+      WHERE sr.segment_1 = node_id AND sr.type = 0
+    );
+  END IF;
   
   -- Build and return node JSON (order: type, name, content if applicable, children)
   IF node_data.item_type = 'content' THEN
-    RETURN jsonb_build_object(
+    node_json := jsonb_build_object(
       'type', node_data.item_type,
       'name', node_data.name,
       'content', jsonb_build_object(
@@ -373,27 +550,31 @@ BEGIN
       'children', children_data
     );
   ELSE
-    RETURN jsonb_build_object(
+    node_json := jsonb_build_object(
       'type', node_data.item_type,
       'name', node_data.name,
       'children', children_data
     );
   END IF;
+  
+  IF is_truncated THEN
+    node_json := node_json || jsonb_build_object('truncated', TRUE);
+  END IF;
+  RETURN node_json;
 END;
 $$ LANGUAGE plpgsql STABLE;
 
--- Main function: Get full tree structure from a segment
-CREATE OR REPLACE FUNCTION get_segment_tree(root_segment_id TEXT)
+-- Main function: Get tree structure from a segment, up to max_depth levels below it
+CREATE OR REPLACE FUNCTION get_segment_tree(root_segment_id TEXT, max_depth INTEGER DEFAULT 8)
 RETURNS JSONB AS $$
   SELECT COALESCE(
     jsonb_object_agg(
       sr.segment_2,
-      build_node_tree(sr.segment_2)
+      build_node_tree(sr.segment_2, max_depth - 1)
     ),
     '{}'::jsonb
   )
   FROM segment_relation sr
-  WHERE sr.segment_1 = root_segment_id AND sr.type = 0;
+  WHERE sr.segment_1 = root_segment_id AND sr.type = 0 AND max_depth > 0;
 $$ LANGUAGE sql STABLE;
 `
-
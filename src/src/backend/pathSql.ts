@@ -0,0 +1,32 @@
+/**
+ * SQL for path-related tables
+ */
+
+/**
+ * Get SQL to create segment_path table
+ */
+export function createSegmentPathTable(): string {
+  return `
+-- Segment Path Table
+-- Pre-computed full path of every segment/content (e.g., 'aa/bb/cc'), root segments store their own name
+-- Kept separate from segment so path maintenance never touches segment.updated_at
+-- Filled and kept up to date by refresh_segment_path() and its triggers
+
+CREATE TABLE IF NOT EXISTS segment_path (
+  id TEXT PRIMARY KEY,                  -- Segment/content ID
+  path TEXT NOT NULL,                   -- Names along direct parent relations, joined by '/'
+  updated_at TIMESTAMP DEFAULT NOW(),
+
+  FOREIGN KEY (id) REFERENCES segment(id) ON DELETE CASCADE
+);
+
+-- Index for path lookups
+CREATE INDEX IF NOT EXISTS idx_segment_path_path ON segment_path(path);
+
+-- Trigger for updated_at
+CREATE TRIGGER update_segment_path_updated_at
+  BEFORE UPDATE ON segment_path
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at_column();
+`.trim()
+}
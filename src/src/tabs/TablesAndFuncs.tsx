@@ -18,9 +18,14 @@ import {
 import {
   createCheckFunctionExistsFunction,
   createGetRootItemsFunction,
+  createGetRootSegmentsFunction,
   createGetPathToRootFunction,
+  createResolvePathFunction,
+  createSegmentPathFunction,
+  createFindContentForSegmentFunction,
   createGetContentByPathFunction,
   createGetSegmentChildrenFunction,
+  createGetChildrenWithTypeFunction,
   createDeleteSegmentFunction,
   createGetSegmentTreeFunction
 } from '../backend/functionSql'
@@ -95,15 +100,39 @@ const functionConfigs = [
     createSQL: createGetRootItemsFunction(),
     dropSQL: 'DROP FUNCTION IF EXISTS get_root_items();'
   },
+  {
+    name: 'get_root_segments',
+    description: 'Get all root-level segments with name and item type - anti-join against direct parent relations computed on the server (includes view segment_root)',
+    createSQL: createGetRootSegmentsFunction(),
+    dropSQL: 'DROP FUNCTION IF EXISTS get_root_segments(); DROP VIEW IF EXISTS segment_root;'
+  },
   {
     name: 'get_path_to_root',
     description: 'Get path to root for a segment - uses recursive CTE to traverse parent chain in a single query, returns array of segment IDs',
     createSQL: createGetPathToRootFunction(),
     dropSQL: 'DROP FUNCTION IF EXISTS get_path_to_root(TEXT);'
   },
+  {
+    name: 'resolve_path',
+    description: 'Resolve path array to an ID - walks segment names from the root with a recursive CTE in a single query, returns the final segment/content ID',
+    createSQL: createResolvePathFunction(),
+    dropSQL: 'DROP FUNCTION IF EXISTS resolve_path(TEXT[]);'
+  },
+  {
+    name: 'refresh_segment_path',
+    description: 'Fill the segment_path table (e.g., aa/bb/cc) and keep it up to date with triggers on segment and segment_relation, lets a path resolve with one indexed lookup (includes triggers and backfill). Requires segment_path table',
+    createSQL: createSegmentPathFunction(),
+    dropSQL: 'DROP TRIGGER IF EXISTS segment_relation_refresh_path ON segment_relation; DROP TRIGGER IF EXISTS segment_refresh_path ON segment; DROP FUNCTION IF EXISTS segment_path_on_relation_change(); DROP FUNCTION IF EXISTS segment_path_on_segment_change(); DROP FUNCTION IF EXISTS refresh_segment_path(TEXT); DO $$ BEGIN IF to_regclass(\'segment_path\') IS NOT NULL THEN TRUNCATE segment_path; END IF; END $$;'
+  },
+  {
+    name: 'find_content_for_segment',
+    description: 'Find content for a segment ID - returns bound, direct child or indirect child content ID (in that priority) in a single query',
+    createSQL: createFindContentForSegmentFunction(),
+    dropSQL: 'DROP FUNCTION IF EXISTS find_content_for_segment(TEXT);'
+  },
   {
     name: 'get_content_by_path',
-    description: 'Get content by path array - returns content data for a given path (handles bind relationships)',
+    description: 'Get content by path array - returns content data for a given path (handles bind relationships, includes binary data in the same row). Requires resolve_path and find_content_for_segment',
     createSQL: createGetContentByPathFunction(),
     dropSQL: 'DROP FUNCTION IF EXISTS get_content_by_path(TEXT[]);'
   },
@@ -113,6 +142,12 @@ const functionConfigs = [
     createSQL: createGetSegmentChildrenFunction(),
     dropSQL: 'DROP FUNCTION IF EXISTS get_segment_children(TEXT[]);'
   },
+  {
+    name: 'get_children_with_type',
+    description: 'Get direct children of a segment ID - returns id, name and item type (segment or content) in a single query',
+    createSQL: createGetChildrenWithTypeFunction(),
+    dropSQL: 'DROP FUNCTION IF EXISTS get_children_with_type(TEXT);'
+  },
   {
     name: 'delete_segment_with_relations',
     description: 'Delete segment and all its relations - removes segment and all relations where it appears as parent or child',
@@ -121,9 +156,9 @@ const functionConfigs = [
   },
   {
     name: 'get_segment_tree',
-    description: 'Get full tree structure from a segment - recursively returns all direct children as nested JSON (includes helper function build_node_tree)',
+    description: 'Get tree structure from a segment - recursively returns direct children as nested JSON, up to max_depth levels (default 8, nodes cut off at the limit are marked truncated, includes helper function build_node_tree)',
     createSQL: createGetSegmentTreeFunction(),
-    dropSQL: 'DROP FUNCTION IF EXISTS get_segment_tree(TEXT); DROP FUNCTION IF EXISTS build_node_tree(TEXT);'
+    dropSQL: 'DROP FUNCTION IF EXISTS get_segment_tree(TEXT, INTEGER); DROP FUNCTION IF EXISTS build_node_tree(TEXT, INTEGER);'
   }
 ]
 
@@ -329,7 +329,7 @@ const TestPythonServer: React.FC = () => {
         <TabsOnTop.Tab label="Tree">
           <div className="request-section">
             <h3>Tree Request</h3>
-            <p className="section-description">Fetch recursive tree structure with all direct children</p>
+            <p className="section-description">Fetch recursive tree structure with all direct children (add &amp;depth=N to go deeper, nodes cut off at the depth limit have truncated: true)</p>
             <div className="form-row">
               <div className="form-group flex-2">
                 <label htmlFor="tree-path">Path (must end with /)</label>